@@ -5,86 +5,51 @@ import usb.util
 import struct
 import time
 import queue
+from collections import deque
 from hershey import *
-from threading import Thread
+from heliosconst import *
+from points import *
+from threading import Thread, RLock, Condition
 import matplotlib.pyplot as plt
 import numpy as np
 
 
-HELIOS_VID	= 0x1209
-HELIOS_PID	= 0xE500
-EP_BULK_OUT	= 0x02
-EP_BULK_IN	= 0x81
-EP_INT_OUT	= 0x06
-EP_INT_IN	= 0x83
-
-INTERFACE_INT =  0
-INTERFACE_BULK = 1
-INTERFACE_ISO =  2
-
-HELIOS_MAX_POINTS	= 0x1000
-HELIOS_MAX_RATE		= 0xFFFF
-HELIOS_MIN_RATE		= 7
-
-HELIOS_SUCCESS		= 1
-
-# Functions return negative values if something went wrong
-# Attempted to perform an action before calling OpenDevices()
-HELIOS_ERROR_NOT_INITIALIZED	=-1
-# Attempted to perform an action with an invalid device number
-HELIOS_ERROR_INVALID_DEVNUM		= -2
-# WriteFrame() called with null pointer to points
-HELIOS_ERROR_NULL_POINTS		= -3
-# WriteFrame() called with a frame containing too many points
-HELIOS_ERROR_TOO_MANY_POINTS	= -4
-# WriteFrame() called with pps higher than maximum allowed
-HELIOS_ERROR_PPS_TOO_HIGH		= -5
-# WriteFrame() called with pps lower than minimum allowed
-HELIOS_ERROR_PPS_TOO_LOW		= -6
-
-# Errors from the HeliosDacDevice class begin at -1000
-# Attempted to perform an operation on a closed DAC device
-HELIOS_ERROR_DEVICE_CLOSED			= -1000
-# Attempted to send a new frame with HELIOS_FLAGS_DONT_BLOCK before previous DoFrame() completed
-HELIOS_ERROR_DEVICE_FRAME_READY		= -1001
-#/ Operation failed because SendControl() failed (if operation failed because of libusb_interrupt_transfer failure, the error code will be a libusb error instead)
-HELIOS_ERROR_DEVICE_SEND_CONTROL	= -1002
-# Received an unexpected result from a call to SendControl()
-HELIOS_ERROR_DEVICE_RESULT			= -1003
-# Attempted to call SendControl() with a null buffer pointer
-HELIOS_ERROR_DEVICE_NULL_BUFFER		= -1004
-# Attempted to call SendControl() with a control signal that is too long
-HELIOS_ERROR_DEVICE_SIGNAL_TOO_LONG	= -1005
-
-HELIOS_ERROR_LIBUSB_BASE		= -5000
-	
-HELIOS_FLAGS_DEFAULT			= 0
-HELIOS_FLAGS_START_IMMEDIATELY	= (1 << 0)
-HELIOS_FLAGS_SINGLE_MODE		= (1 << 1)
-HELIOS_FLAGS_DONT_BLOCK			= (1 << 2)
-
-
-HELIOS_CMD_STOP					=0x0001
-HELIOS_CMD_SHUTTER				=0x0002
-HELIOS_CMD_GET_STATUS			=0x0003
-HELIOS_GET_FWVERSION			=0x0004
-HELIOS_CMD_GET_NAME				=0x0005
-HELIOS_CMD_SET_NAME				=0x0006
-HELIOS_SET_SDK_VERSION			=0x0007
-HELIOS_CMD_ERASE_FIRMWARE		=0x00de
-
-HELIOS_SDK_VERSION	=	6
-
-class HeliosPoint():
-	def __init__(self,x,y,c = 0xff0000,i= 255,blank=False):
-		self.x = x
-		self.y = y
-		self.c = 0x010203
-		self.i = i
-		self.blank = blank
-		
-	def __str__(self):
-		return "HeleiosPoint(%d, %d,0x%0x,%d,%d)" % (self.x, self.y, self.c,self.i, self.blank)
+def packFrame(pps, points, flags = HELIOS_FLAGS_DEFAULT):
+	# packs a HELIOS_POINT_DTYPE array into the bytes written to the dac, returns a
+	# negative error code if the frame can't be sent
+	if (points is None):
+		return HELIOS_ERROR_NULL_POINTS
+
+	if ( len(points) > HELIOS_MAX_POINTS):
+		return HELIOS_ERROR_TOO_MANY_POINTS
+
+	if (pps > HELIOS_MAX_RATE):
+		return HELIOS_ERROR_PPS_TOO_HIGH
+
+	if (pps < HELIOS_MIN_RATE):
+		return HELIOS_ERROR_PPS_TOO_LOW
+
+	#this is a bug workaround, the mcu won't correctly receive transfers with these sizes
+	ppsActual = pps;
+	numOfPointsActual = len(points)
+	if (((len(points)-45) % 64) == 0):
+		numOfPointsActual-=1
+		ppsActual = int((pps * numOfPointsActual / len(points) + 0.5))
+
+	points = points[:numOfPointsActual]
+	x = points["x"].astype(np.uint16)
+	y = points["y"].astype(np.uint16)
+	packed = np.empty((len(points),7), dtype=np.uint8)
+	packed[:,0] = (x >> 4) & 0xff
+	packed[:,1] = ((x & 0x0F) << 4) | ((y >> 8) & 0x0F)
+	packed[:,2] = y & 0xff
+	packed[:,3] = points["r"]
+	packed[:,4] = points["g"]
+	packed[:,5] = points["b"]
+	packed[:,6] = points["i"]
+	framebuffer = packed.tobytes()
+	framebuffer += struct.pack("BBBBB",  (ppsActual & 0xFF),(ppsActual >> 8) ,(len(points) & 0xFF),(len(points) >> 8),flags)
+	return framebuffer
 
 class HeliosDAC():
 	def __init__(self,queuethread=True, debug=0):
@@ -94,6 +59,15 @@ class HeliosDAC():
 		self.framebuffer = b""
 		self.threadqueue = queue.Queue(maxsize=20)
 		self.nextframebuffer = b""
+		self.recorder = None
+		self.recordname = None
+		self.controllock = RLock()
+		self.statuscond = Condition()
+		self.statuspending = False
+		self.statusgen = 0
+		self.statusreply = None
+		self.name = None
+		self.fwversion = None
 		self.adcbits = 12
 		self.dev = usb.core.find(idVendor=HELIOS_VID, idProduct=HELIOS_PID)
 		self.cfg = self.dev.get_active_configuration()
@@ -394,15 +368,16 @@ class HeliosDAC():
 			self.DoFrame();
 
 	def getHWVersion(self):
-		self.intf[1].write(struct.pack("<H",HELIOS_GET_FWVERSION))
-		transferResult = self.intf[0].read(32)
-		if transferResult[0] == 0x84:
-			return struct.unpack("<L",transferResult[1:])[0]
-		else:
-			return None
+		# the firmware version can't change while we are attached so it is only asked for once
+		if self.fwversion is None:
+			transferResult = self.ControlQuery(struct.pack("<H",HELIOS_GET_FWVERSION), HELIOS_RESPONSE_FWVERSION)
+			if transferResult is None:
+				return None
+			self.fwversion = struct.unpack("<L",transferResult[1:5])[0]
+		return self.fwversion
 		
 	def setSDKVersion(self, version = HELIOS_SDK_VERSION):
-		self.intf[1].write(struct.pack("<H",(version << 8) | HELIOS_SET_SDK_VERSION))
+		self.SendControl(struct.pack("<H",(version << 8) | HELIOS_SET_SDK_VERSION))
 		return
 		
 	def setShutter(self, shutter=False):
@@ -410,87 +385,141 @@ class HeliosDAC():
 		return
 		
 	def setName(self, name):
-		self.SendControl(struct.pack("<H", HELIOS_CMD_SET_NAME) + name[:30] + b"\x00")
+		with self.controllock:
+			self.SendControl(struct.pack("<H", HELIOS_CMD_SET_NAME) + name[:30] + b"\x00")
+			self.name = None
 		return
 
 	def newFrame(self,pps, pntobjlist, flags = HELIOS_FLAGS_DEFAULT):
 		if self.closed:
 			return HELIOS_ERROR_DEVICE_CLOSED;
 
+		if (pntobjlist is None):
+			return HELIOS_ERROR_NULL_POINTS
+
 		if ( len(pntobjlist) > HELIOS_MAX_POINTS):
 			return HELIOS_ERROR_TOO_MANY_POINTS
 
-		if (pps > HELIOS_MAX_RATE):
-			return HELIOS_ERROR_PPS_TOO_HIGH
+		return self.newFrameArray(pps, pointsToArray(pntobjlist), flags)
+
+	def newFrameArray(self,pps, points, flags = HELIOS_FLAGS_DEFAULT, block=True):
+		# same as newFrame but takes a HELIOS_POINT_DTYPE array and packs it without
+		# creating a HeliosPoint per point
+		if self.closed:
+			return HELIOS_ERROR_DEVICE_CLOSED;
+
+		nextframebuffer = packFrame(pps, points, flags)
+		if isinstance(nextframebuffer, int):
+			return nextframebuffer
+		try:
+			self.threadqueue.put(nextframebuffer, block=block)
+		except queue.Full:
+			return HELIOS_ERROR_DEVICE_FRAME_READY
+		return HELIOS_SUCCESS
 
-		if (pps < HELIOS_MIN_RATE):
-			return HELIOS_ERROR_PPS_TOO_LOW
-		
-		#this is a bug workaround, the mcu won't correctly receive transfers with these sizes
-		ppsActual = pps;
-		numOfPointsActual = len(pntobjlist)
-		if (((len(pntobjlist)-45) % 64) == 0):
-			numOfPointsActual-=1
-			ppsActual = int((pps * numOfPointsActual / len(pntobjlist) + 0.5))
-
-		pntobjlist = pntobjlist[:numOfPointsActual]
-		nextframebuffer = b""
-		for pnt in pntobjlist:
-			a = (pnt.x >> 4) & 0xff
-			b = ((pnt.x & 0x0F) << 4) | (pnt.y >> 8)
-			c = pnt.y & 0xFF
-			if pnt.blank == False:
-				r = (pnt.c & 0xff0000) >> 16
-				g = (pnt.c & 0xff00) >> 8
-				b = (pnt.c & 0xff)
-				i = pnt.i
-			else:
-				r = 0
-				g = 0
-				b = 0
-				i = 0
-			nextframebuffer += struct.pack("BBBBBBB", a,b,c,r,g,b,i)
-		nextframebuffer += struct.pack("BBBBB",  (ppsActual & 0xFF),(ppsActual >> 8) ,(len(pntobjlist) & 0xFF),(len(pntobjlist) >> 8),flags)
-		self.threadqueue.put(nextframebuffer)
-		
 	def DoFrame(self):
 		if (self.closed):
 			return HELIOS_ERROR_DEVICE_CLOSED;
 		self.nextframebuffer = self.threadqueue.get(block=True)
-		self.intf[3].write(self.nextframebuffer)
+		return self.writeFrame(self.nextframebuffer)
+
+	def writeFrame(self, framebuffer):
+		# sends an already packed frame and waits for the dac to be ready for the next one
+		if (self.closed):
+			return HELIOS_ERROR_DEVICE_CLOSED;
+		# read once, stopRecording() may clear it from another thread
+		recorder = self.recorder
+		if recorder is not None:
+			recorder.record(self.recordname, framebuffer)
+		self.intf[3].write(framebuffer)
 		t = time.time()
 		time.sleep(.1)
 		try:
-			while self.getStatus()[1] == 0:
+			while True:
+				status = self.getStatus()
+				if (status is not None) and (status[1] != 0):
+					break
 				time.sleep(0.1)
 		except usb.core.USBTimeoutError:
 			print("timeout")
 			pass  # ignore broken getStatus
 		return True
 
+	def startRecording(self, recorder, name=None):
+		# every frame sent from now on is appended to recorder (a HeliosCapture)
+		if name is None:
+			name = self.GetName()
+			name = name.rstrip("\x00") if name else "helios"
+		self.recordname = name
+		self.recorder = recorder
+
+	def stopRecording(self):
+		self.recorder = None
+
 	def GetName(self):
-		self.SendControl(struct.pack("<H",HELIOS_CMD_GET_NAME))
-		x = self.intf[0].read(32)[:16]
-		if x[0] == 0x85:
-			return "".join([chr(t) for t in x[1:]])
-		else:
-			return None
+		# cached until setName() changes it
+		with self.controllock:
+			if self.name is None:
+				x = self.ControlQuery(struct.pack("<H",HELIOS_CMD_GET_NAME), HELIOS_RESPONSE_NAME)
+				if x is None:
+					return None
+				self.name = "".join([chr(t) for t in x[1:16]])
+			return self.name
 				
 	def SendControl(self, buffer):
 		if (buffer == None):
 			return HELIOS_ERROR_DEVICE_NULL_BUFFER;
 		if (len(buffer) > 32):
 			return HELIOS_ERROR_DEVICE_SIGNAL_TOO_LONG;
-		self.intf[1].write(buffer)
+		with self.controllock:
+			self.intf[1].write(buffer)
+		return HELIOS_SUCCESS
+
+	def ControlQuery(self, buffer, response):
+		# sends a control command and returns the reply starting with the response code,
+		# the control lock is held throughout so no other thread can take our reply.
+		# replies left over from an earlier timed out query are skipped
+		with self.controllock:
+			ret = self.SendControl(buffer)
+			if ret != HELIOS_SUCCESS:
+				return None
+			for i in range(HELIOS_CONTROL_RETRIES):
+				ret = self.intf[0].read(32)
+				if (len(ret) > 0) and (ret[0] == response):
+					return ret
+				if self.debug:
+					print("discarding stale control reply", ret)
+		return None
 
 	def stop(self):
-		self.SendControl(struct.pack("<H",0x0001), 2)
+		self.SendControl(struct.pack("<H",HELIOS_CMD_STOP))
 		time.sleep(.1)
 		return
 	
 	def getStatus(self):
-		self.SendControl(struct.pack("<H",0x0003))
-		ret = self.intf[0].read(32)
+		# callers arriving while a status query is already on the wire wait for and share
+		# its reply instead of queueing another round trip behind it
+		with self.statuscond:
+			if self.statuspending:
+				gen = self.statusgen
+				while self.statusgen == gen:
+					self.statuscond.wait()
+				ret = self.statusreply
+				if isinstance(ret, Exception):
+					raise ret
+				return ret
+			self.statuspending = True
+		try:
+			ret = self.ControlQuery(struct.pack("<H",HELIOS_CMD_GET_STATUS), HELIOS_RESPONSE_STATUS)
+		except Exception as e:
+			ret = e
+		with self.statuscond:
+			self.statusreply = ret
+			self.statusgen += 1
+			self.statuspending = False
+			self.statuscond.notify_all()
+		if isinstance(ret, Exception):
+			raise ret
 		if self.debug:
 			print(ret)
 		return ret
@@ -515,6 +544,76 @@ class HeliosDAC():
 
 		return pointstream
 
+	def scrollText(self,text,xpos,ypos,width,step=10,cindex=0,scale=1.0):
+		# generator yielding one point list per frame, text enters at the right edge of a
+		# width wide window starting at xpos and moves left by step each frame.
+		# text can be any iterable of characters (including an endless one), only the glyphs
+		# currently inside the window are kept and glyphs on the edges are clipped.
+		# frames are not decimated, a wide window at a small scale can hold more than
+		# HELIOS_MAX_POINTS points and newFrame will refuse it with HELIOS_ERROR_TOO_MANY_POINTS
+		if step <= 0:
+			raise ValueError("step must be positive, got %r" % (step,))
+		return self._scrollFrames(text,xpos,ypos,width,step,cindex,scale)
+
+	def _scrollFrames(self,text,xpos,ypos,width,step,cindex,scale):
+		advance = HERSHEY_WIDTH * scale
+		chars = iter(text)
+		window = deque()		# (window relative left edge at offset 0, strokes)
+		nextleft = width
+		exhausted = False
+		offset = 0
+		while True:
+			while window and (window[0][0] - offset + advance <= 0):
+				window.popleft()
+			while (not exhausted) and (nextleft - offset < width):
+				try:
+					c = next(chars)
+				except StopIteration:
+					exhausted = True
+					break
+				window.append((nextleft, hersheyStrokes(c)))
+				nextleft += advance
+			if exhausted and not window:
+				return
+
+			pointstream = []
+			for left,strokes in window:
+				left -= offset
+				for stroke in strokes:
+					pen = None
+					for (x0,y0),(x1,y1) in zip(stroke,stroke[1:]):
+						seg = self._clipSegment(left + x0 * scale, y0 * scale, left + x1 * scale, y1 * scale, width)
+						if seg is None:
+							pen = None
+							continue
+						(sx,sy,ex,ey) = seg
+						if pen != (sx,sy):
+							pointstream.append(HeliosPoint(int(xpos + sx),int(ypos + sy),blank=True))
+							pointstream.append(HeliosPoint(int(xpos + sx),int(ypos + sy),self.palette[cindex]))
+						pointstream.append(HeliosPoint(int(xpos + ex),int(ypos + ey),self.palette[cindex]))
+						pen = (ex,ey)
+			if not pointstream:
+				pointstream.append(HeliosPoint(xpos,ypos,blank=True))
+			yield pointstream
+			offset += step
+
+	def _clipSegment(self,x0,y0,x1,y1,width):
+		# clips a line to 0 <= x <= width, returns None if it lies entirely outside
+		if x0 > x1:
+			seg = self._clipSegment(x1,y1,x0,y0,width)
+			if seg is None:
+				return None
+			return (seg[2],seg[3],seg[0],seg[1])
+		if (x1 < 0) or (x0 > width):
+			return None
+		if x0 < 0:
+			y0 = y0 + (y1 - y0) * (0 - x0) / (x1 - x0)
+			x0 = 0
+		if x1 > width:
+			y1 = y0 + (y1 - y0) * (width - x0) / (x1 - x0)
+			x1 = width
+		return (x0,y0,x1,y1)
+
 	def loadILDfile(self,filename, xscale=1.0, yscale=1.0):
 		f = open(filename,"rb")
 		headerstruct = ">4s3xB8s8sHHHBx"
@@ -548,9 +647,11 @@ class HeliosDAC():
 						
 							blank = (status & 0x40) > 0
 							lastpoint = (status & 0x80) > 0
+							# ilda coordinates are signed around the center, the dac's are unsigned
 							lessadcbits = (16 - self.adcbits)
-							x = int((x >> lessadcbits) * xscale)
-							y = int((y >> lessadcbits) * yscale)
+							center = 1 << (self.adcbits - 1)
+							x = int((x >> lessadcbits) * xscale) + center
+							y = int((y >> lessadcbits) * yscale) + center
 							pointlist.append(HeliosPoint(x,y,self.palette[cindex],blank=blank))
 							
 						elif format == 2:
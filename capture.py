@@ -0,0 +1,156 @@
+import mmap
+import os
+import struct
+import time
+from threading import Lock
+
+# capture file layout, a magic followed by records of
+#	monotonic timestamp (ns), device name length, payload length, device name, payload
+# the payload is exactly what was written to the dac's bulk endpoint
+CAPTURE_MAGIC	= b"HLCAP\x00\x01\x00"
+CAPTURE_RECORD	= struct.Struct("<QHI")
+
+
+class HeliosCapture():
+	# append only recorder, attach with HeliosDAC.startRecording(). one capture can be
+	# shared by several dacs, records are told apart by device name. an existing capture
+	# is appended to, after dropping a last record cut short by a crash
+	def __init__(self, filename, flush=True):
+		self.filename = filename
+		self.flush = flush
+		self.lock = Lock()
+		self.frames = 0
+		if os.path.exists(filename):
+			self.f = open(filename, "r+b")
+		else:
+			self.f = open(filename, "w+b")
+		try:
+			end = self._validEnd()
+		except ValueError:
+			self.f.close()
+			raise
+		self.f.truncate(end)
+		self.f.seek(end)
+		if end == 0:
+			self.f.write(CAPTURE_MAGIC)
+			self.f.flush()
+
+	def _validEnd(self):
+		# offset just past the last complete record, 0 for an empty file (or one with
+		# only part of the magic written)
+		size = os.fstat(self.f.fileno()).st_size
+		self.f.seek(0)
+		magic = self.f.read(len(CAPTURE_MAGIC))
+		if magic != CAPTURE_MAGIC:
+			if CAPTURE_MAGIC.startswith(magic):
+				return 0
+			raise ValueError("%s is not a capture file" % self.filename)
+		pos = len(CAPTURE_MAGIC)
+		while pos + CAPTURE_RECORD.size <= size:
+			self.f.seek(pos)
+			(timestamp, namelen, length) = CAPTURE_RECORD.unpack(self.f.read(CAPTURE_RECORD.size))
+			if pos + CAPTURE_RECORD.size + namelen + length > size:
+				break
+			pos += CAPTURE_RECORD.size + namelen + length
+		return pos
+
+	def record(self, name, payload, timestamp=None):
+		if timestamp is None:
+			timestamp = time.monotonic_ns()
+		if isinstance(name, str):
+			name = name.encode()
+		with self.lock:
+			# a frame already on its way when the capture was closed is not recorded
+			if self.f.closed:
+				return
+			self.f.write(CAPTURE_RECORD.pack(timestamp, len(name), len(payload)) + name)
+			self.f.write(payload)
+			if self.flush:
+				self.f.flush()
+			self.frames += 1
+
+	def close(self):
+		with self.lock:
+			self.f.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+
+class HeliosReplay():
+	# reads a capture through mmap, only the records asked for are paged in
+	def __init__(self, filename):
+		self.filename = filename
+		self.f = open(filename, "rb")
+		size = os.fstat(self.f.fileno()).st_size
+		if size < len(CAPTURE_MAGIC):
+			raise ValueError("%s is not a capture file" % filename)
+		self.map = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+		if self.map[:len(CAPTURE_MAGIC)] != CAPTURE_MAGIC:
+			self.close()
+			raise ValueError("%s is not a capture file" % filename)
+
+	def frames(self, name=None):
+		# yields (timestamp ns, device name, payload), a record cut short by a crash
+		# while recording ends the stream. payloads are copied out as bytes so nothing
+		# keeps the map open once the caller stops iterating
+		if isinstance(name, str):
+			name = name.encode()
+		buf = self.map
+		pos = len(CAPTURE_MAGIC)
+		end = len(buf)
+		while pos + CAPTURE_RECORD.size <= end:
+			(timestamp, namelen, length) = CAPTURE_RECORD.unpack_from(buf, pos)
+			pos += CAPTURE_RECORD.size
+			if pos + namelen + length > end:
+				return
+			recname = buf[pos:pos + namelen]
+			pos += namelen
+			if (name is None) or (name == recname):
+				yield (timestamp, recname.decode(errors="replace"), buf[pos:pos + length])
+			pos += length
+
+	def replay(self, target, realtime=True, speed=1.0, name=None):
+		# sends every frame to target.writeFrame(), target is a HeliosDAC, a stand-in with
+		# the same method, or a dict of them keyed by device name. with realtime the
+		# original spacing between frames is kept (scaled by speed), otherwise frames are
+		# sent as fast as the target takes them.
+		# returns (frames, bytes, seconds, worst lateness in seconds)
+		frames = 0
+		nbytes = 0
+		late = 0.0
+		start = time.monotonic()
+		first = None
+		for timestamp, recname, payload in self.frames(name):
+			if isinstance(target, dict):
+				dest = target.get(recname)
+				if dest is None:
+					continue
+			else:
+				dest = target
+			if first is None:
+				first = timestamp
+			if realtime:
+				due = start + (timestamp - first) / 1e9 / speed
+				wait = due - time.monotonic()
+				if wait > 0:
+					time.sleep(wait)
+				else:
+					late = max(late, -wait)
+			dest.writeFrame(payload)
+			frames += 1
+			nbytes += len(payload)
+		return (frames, nbytes, time.monotonic() - start, late)
+
+	def close(self):
+		self.map.close()
+		self.f.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
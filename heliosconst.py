@@ -0,0 +1,74 @@
+# protocol constants and error codes, kept free of usb so code that only builds or
+# forwards frames (ingest clients, render machines) can use them without a usb stack
+
+HELIOS_VID	= 0x1209
+HELIOS_PID	= 0xE500
+EP_BULK_OUT	= 0x02
+EP_BULK_IN	= 0x81
+EP_INT_OUT	= 0x06
+EP_INT_IN	= 0x83
+
+INTERFACE_INT =  0
+INTERFACE_BULK = 1
+INTERFACE_ISO =  2
+
+HELIOS_MAX_POINTS	= 0x1000
+HELIOS_MAX_RATE		= 0xFFFF
+HELIOS_MIN_RATE		= 7
+
+HELIOS_SUCCESS		= 1
+
+# Functions return negative values if something went wrong
+# Attempted to perform an action before calling OpenDevices()
+HELIOS_ERROR_NOT_INITIALIZED	=-1
+# Attempted to perform an action with an invalid device number
+HELIOS_ERROR_INVALID_DEVNUM		= -2
+# WriteFrame() called with null pointer to points
+HELIOS_ERROR_NULL_POINTS		= -3
+# WriteFrame() called with a frame containing too many points
+HELIOS_ERROR_TOO_MANY_POINTS	= -4
+# WriteFrame() called with pps higher than maximum allowed
+HELIOS_ERROR_PPS_TOO_HIGH		= -5
+# WriteFrame() called with pps lower than minimum allowed
+HELIOS_ERROR_PPS_TOO_LOW		= -6
+
+# Errors from the HeliosDacDevice class begin at -1000
+# Attempted to perform an operation on a closed DAC device
+HELIOS_ERROR_DEVICE_CLOSED			= -1000
+# Attempted to send a new frame with HELIOS_FLAGS_DONT_BLOCK before previous DoFrame() completed
+HELIOS_ERROR_DEVICE_FRAME_READY		= -1001
+#/ Operation failed because SendControl() failed (if operation failed because of libusb_interrupt_transfer failure, the error code will be a libusb error instead)
+HELIOS_ERROR_DEVICE_SEND_CONTROL	= -1002
+# Received an unexpected result from a call to SendControl()
+HELIOS_ERROR_DEVICE_RESULT			= -1003
+# Attempted to call SendControl() with a null buffer pointer
+HELIOS_ERROR_DEVICE_NULL_BUFFER		= -1004
+# Attempted to call SendControl() with a control signal that is too long
+HELIOS_ERROR_DEVICE_SIGNAL_TOO_LONG	= -1005
+
+HELIOS_ERROR_LIBUSB_BASE		= -5000
+	
+HELIOS_FLAGS_DEFAULT			= 0
+HELIOS_FLAGS_START_IMMEDIATELY	= (1 << 0)
+HELIOS_FLAGS_SINGLE_MODE		= (1 << 1)
+HELIOS_FLAGS_DONT_BLOCK			= (1 << 2)
+
+
+HELIOS_CMD_STOP					=0x0001
+HELIOS_CMD_SHUTTER				=0x0002
+HELIOS_CMD_GET_STATUS			=0x0003
+HELIOS_GET_FWVERSION			=0x0004
+HELIOS_CMD_GET_NAME				=0x0005
+HELIOS_CMD_SET_NAME				=0x0006
+HELIOS_SET_SDK_VERSION			=0x0007
+HELIOS_CMD_ERASE_FIRMWARE		=0x00de
+
+# first byte of the interrupt endpoint reply to each query
+HELIOS_RESPONSE_STATUS			=0x83
+HELIOS_RESPONSE_FWVERSION		=0x84
+HELIOS_RESPONSE_NAME			=0x85
+
+# replies read while looking for the one matching a query, anything else is a stale reply
+HELIOS_CONTROL_RETRIES			= 4
+
+HELIOS_SDK_VERSION	=	6
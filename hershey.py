@@ -192,3 +192,30 @@ HERSHEY_FONT = [
 				#Ascii 126
 				[(23,24),(3, 6),(3, 8),(4, 11),(6, 12),(8, 12),(10, 11),(14, 8),(16, 7),(18, 7),(20, 8),(21, 10),(-1, -1),(3, 8),(4, 10),(6, 11),(8, 11),(10, 10),(14, 7),(16, 6),(18, 6),(20, 7),(21, 10),(21, 12),(-1, -1)]]
 
+
+
+HERSHEY_STROKES = {}
+
+def hersheyStrokes(c):
+	# returns the glyph for c split into pen-down strokes, the first entry of each
+	# font record is (vertex count, advance) and (-1,-1) marks a pen up.
+	# results are cached by font index so a long text stream only ever lays out each glyph once
+	o = ord(c) - 32
+	if (o < 0) or (o >= len(HERSHEY_FONT)):
+		o = 0
+	strokes = HERSHEY_STROKES.get(o)
+	if strokes is None:
+		strokes = []
+		stroke = []
+		for x,y in HERSHEY_FONT[o][1:]:
+			if (x == -1) and (y == -1):
+				if len(stroke) > 1:
+					strokes.append(tuple(stroke))
+				stroke = []
+			else:
+				stroke.append((x,y))
+		if len(stroke) > 1:
+			strokes.append(tuple(stroke))
+		strokes = tuple(strokes)
+		HERSHEY_STROKES[o] = strokes
+	return strokes
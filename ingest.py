@@ -0,0 +1,265 @@
+import random
+import socket
+import socketserver
+import struct
+import time
+from threading import Thread, Lock
+import numpy as np
+from heliosconst import *
+from points import HELIOS_POINT_DTYPE
+
+# frame packet, the header is followed by npoints HELIOS_POINT_DTYPE records (8 bytes each)
+#	magic, version, flags, pps, stream id, sequence, npoints, dac name (null padded)
+# every sender picks its own random stream id and numbers its frames from 0, sequence
+# numbers are only compared within a stream
+INGEST_MAGIC	= b"HLFP"
+INGEST_VERSION	= 2
+INGEST_HEADER	= struct.Struct("<4sBBHIIH16s")
+INGEST_PORT		= 7255
+
+# over tcp every packet is prefixed with its length
+INGEST_TCP_LENGTH = struct.Struct("<I")
+
+INGEST_MAX_PACKET = INGEST_HEADER.size + HELIOS_MAX_POINTS * HELIOS_POINT_DTYPE.itemsize
+
+# udp receive buffer asked for, room for a burst of full size frames
+INGEST_RCVBUF = 4 * 1024 * 1024
+
+# a frame at most this far behind the last one of its stream is late, further back and the
+# sender is taken to have restarted and the stream is resynced on it
+INGEST_LATE_WINDOW = 256
+
+# streams remembered per dac, the least recently heard from is forgotten first
+INGEST_MAX_STREAMS = 16
+
+# errors from the ingest server begin at -2000
+# packet could not be decoded
+INGEST_ERROR_BAD_PACKET		= -2000
+# packet has coordinates outside the 12 bit dac range
+INGEST_ERROR_OUT_OF_RANGE	= -2001
+
+
+def packIngestFrame(name, seq, pps, points, flags = HELIOS_FLAGS_DEFAULT, stream=0):
+	# builds a frame packet from a HELIOS_POINT_DTYPE array, name is the dac to route to
+	if isinstance(name, str):
+		name = name.encode()
+	points = np.ascontiguousarray(points, dtype=HELIOS_POINT_DTYPE)
+	return INGEST_HEADER.pack(INGEST_MAGIC, INGEST_VERSION, flags, pps, stream & 0xFFFFFFFF, seq & 0xFFFFFFFF, len(points), name[:16]) + points.tobytes()
+
+def unpackIngestFrame(data):
+	# returns (name, stream, seq, pps, flags, points) or None for a malformed packet, the
+	# points array is a view onto data so no per point work is done
+	if len(data) < INGEST_HEADER.size:
+		return None
+	(magic, version, flags, pps, stream, seq, npoints, name) = INGEST_HEADER.unpack_from(data)
+	if (magic != INGEST_MAGIC) or (version != INGEST_VERSION):
+		return None
+	if len(data) != INGEST_HEADER.size + npoints * HELIOS_POINT_DTYPE.itemsize:
+		return None
+	points = np.frombuffer(data, dtype=HELIOS_POINT_DTYPE, count=npoints, offset=INGEST_HEADER.size)
+	return (name.rstrip(b"\x00").decode(errors="replace"), stream, seq, pps, flags, points)
+
+
+class IngestStats():
+	def __init__(self):
+		self.received = 0
+		self.queued = 0
+		self.dropped_late = 0
+		self.dropped_full = 0
+		self.lost = 0			# frames missing from the sequence numbers seen
+		self.resyncs = 0		# streams that jumped back far enough to be taken as restarted
+		self.rejected = 0
+		self.points = 0
+		self.bytes = 0
+		self.started = time.monotonic()
+
+	def rates(self):
+		# frames, points and bytes per second since the counters were created
+		elapsed = max(time.monotonic() - self.started, 1e-9)
+		return (self.queued / elapsed, self.points / elapsed, self.bytes / elapsed)
+
+	def __str__(self):
+		return "IngestStats(received %d, queued %d, late %d, full %d, lost %d, resyncs %d, rejected %d, %d points, %d bytes)" % (self.received, self.queued, self.dropped_late, self.dropped_full, self.lost, self.resyncs, self.rejected, self.points, self.bytes)
+
+
+class _UDPHandler(socketserver.BaseRequestHandler):
+	def handle(self):
+		self.server.ingest.ingest(self.request[0])
+
+class _TCPHandler(socketserver.BaseRequestHandler):
+	def handle(self):
+		f = self.request.makefile("rb")
+		while self.server.ingest.running:
+			hdr = f.read(INGEST_TCP_LENGTH.size)
+			if len(hdr) < INGEST_TCP_LENGTH.size:
+				return
+			(length,) = INGEST_TCP_LENGTH.unpack(hdr)
+			if length > INGEST_MAX_PACKET:
+				self.server.ingest.reject(None, length)
+				return
+			data = f.read(length)
+			if len(data) < length:
+				return
+			self.server.ingest.ingest(data)
+
+class _UDPServer(socketserver.UDPServer):
+	allow_reuse_address = True
+	max_packet_size = INGEST_MAX_PACKET
+
+	def server_bind(self):
+		# the os may cap this, it is only a request
+		try:
+			self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, INGEST_RCVBUF)
+		except OSError:
+			pass
+		socketserver.UDPServer.server_bind(self)
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+	allow_reuse_address = True
+	daemon_threads = True
+
+
+class HeliosIngestServer():
+	# receives frame packets over udp and/or tcp and queues them on the named dac.
+	# frames a little older than the last one seen from the same sender stream are
+	# dropped as late, a big jump back is a restarted sender and resyncs the stream, frames arriving while the dac queue is full are dropped,
+	# and gaps in the sequence numbers are counted as lost. frames with coordinates
+	# above 0xFFF are rejected
+	def __init__(self, host="127.0.0.1", port=INGEST_PORT, udp=True, tcp=True, debug=0):
+		self.debug = debug
+		self.host = host
+		self.port = port
+		self.dacs = {}
+		self.lastseq = {}
+		self.stats = IngestStats()
+		self.dacstats = {}
+		self.lock = Lock()
+		self.running = False
+		self.servers = []
+		if udp:
+			self.servers.append(_UDPServer((host, port), _UDPHandler, bind_and_activate=False))
+		if tcp:
+			self.servers.append(_TCPServer((host, port), _TCPHandler, bind_and_activate=False))
+
+	def addDAC(self, name, dac):
+		# dac only needs newFrameArray(), so anything with that method can be a target
+		with self.lock:
+			self.dacs[name] = dac
+			self.dacstats[name] = IngestStats()
+			self.lastseq.pop(name, None)
+
+	def removeDAC(self, name):
+		with self.lock:
+			self.dacs.pop(name, None)
+			self.lastseq.pop(name, None)
+
+	def start(self):
+		self.running = True
+		for srv in self.servers:
+			srv.ingest = self
+			srv.server_bind()
+			srv.server_activate()
+			worker = Thread(target=srv.serve_forever, kwargs={"poll_interval": 0.1})
+			worker.daemon = True
+			worker.start()
+		return self
+
+	def stop(self):
+		self.running = False
+		for srv in self.servers:
+			srv.shutdown()
+			srv.server_close()
+
+	def addresses(self):
+		# the bound (host, port) of each listener, useful when started with port 0
+		return [srv.socket.getsockname() for srv in self.servers]
+
+	def reject(self, name, length):
+		with self.lock:
+			self.stats.rejected += 1
+			self.stats.bytes += length
+			if name in self.dacstats:
+				self.dacstats[name].rejected += 1
+		if self.debug:
+			print("rejected packet for %s (%d bytes)" % (name, length))
+
+	def ingest(self, data):
+		frame = unpackIngestFrame(data)
+		if frame is None:
+			self.reject(None, len(data))
+			return INGEST_ERROR_BAD_PACKET
+		(name, stream, seq, pps, flags, points) = frame
+		if (len(points) > 0) and ((points["x"].max() > 0xFFF) or (points["y"].max() > 0xFFF)):
+			self.reject(name, len(data))
+			return INGEST_ERROR_OUT_OF_RANGE
+		with self.lock:
+			dac = self.dacs.get(name)
+			if dac is None:
+				self.stats.rejected += 1
+				self.stats.bytes += len(data)
+				return HELIOS_ERROR_INVALID_DEVNUM
+			stats = self.dacstats[name]
+			for s in (self.stats, stats):
+				s.received += 1
+				s.bytes += len(data)
+			streams = self.lastseq.setdefault(name, {})
+			last = streams.pop(stream, None)
+			if last is not None:
+				# serial number arithmetic so the sequence can wrap
+				ahead = (seq - last) & 0xFFFFFFFF
+				if 0 < ahead < 0x80000000:
+					self.stats.lost += ahead - 1
+					stats.lost += ahead - 1
+				elif ((last - seq) & 0xFFFFFFFF) <= INGEST_LATE_WINDOW:
+					streams[stream] = last
+					self.stats.dropped_late += 1
+					stats.dropped_late += 1
+					return HELIOS_ERROR_DEVICE_FRAME_READY
+				else:
+					self.stats.resyncs += 1
+					stats.resyncs += 1
+			elif len(streams) >= INGEST_MAX_STREAMS:
+				del streams[next(iter(streams))]
+			streams[stream] = seq		# reinserted so the dict stays in least recently used order
+
+		ret = dac.newFrameArray(pps, points, flags, block=False)
+		with self.lock:
+			if ret == HELIOS_SUCCESS:
+				for s in (self.stats, stats):
+					s.queued += 1
+					s.points += len(points)
+			elif ret == HELIOS_ERROR_DEVICE_FRAME_READY:
+				self.stats.dropped_full += 1
+				stats.dropped_full += 1
+			else:
+				self.stats.rejected += 1
+				stats.rejected += 1
+		return ret
+
+
+class HeliosIngestClient():
+	# sends frames to a HeliosIngestServer, keeps a sequence number per dac name. each client
+	# is its own stream so several senders (or a restarted one) can feed the same dac
+	def __init__(self, host="127.0.0.1", port=INGEST_PORT, tcp=False, stream=None):
+		self.tcp = tcp
+		self.addr = (host, port)
+		self.seq = {}
+		self.stream = random.getrandbits(32) if stream is None else stream
+		if tcp:
+			self.sock = socket.create_connection(self.addr)
+			self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+		else:
+			self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+	def sendFrame(self, name, pps, points, flags = HELIOS_FLAGS_DEFAULT):
+		seq = self.seq.get(name, 0)
+		self.seq[name] = (seq + 1) & 0xFFFFFFFF
+		data = packIngestFrame(name, seq, pps, points, flags, self.stream)
+		if self.tcp:
+			self.sock.sendall(INGEST_TCP_LENGTH.pack(len(data)) + data)
+		else:
+			self.sock.sendto(data, self.addr)
+		return seq
+
+	def close(self):
+		self.sock.close()
@@ -0,0 +1,187 @@
+import pickle
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from threading import Thread
+from Helios import *
+
+# frame production split into stages, each running on its own worker with bounded queues in
+# between so a slow usb write overlaps with building the next frames:
+#	source -> transform -> optimize -> encode -> transmit
+# source is any iterable of frames, transform and optimize are optional functions taking and
+# returning a frame (returning None drops it), encode packs the frame for the dac and
+# transmit writes it. the dac should be opened with queuethread=False since the pipeline
+# does the sending
+
+PIPELINE_STAGES = ("source", "transform", "optimize", "encode", "transmit")
+
+_STOP = object()
+
+
+def encodeFrame(pps, flags, points):
+	# the default encode stage, module level so it can be sent to a process worker
+	return packFrame(pps, pointsToArray(points), flags)
+
+
+class PipelineStageStats():
+	def __init__(self, name, worker):
+		self.name = name
+		self.worker = worker
+		self.items = 0
+		self.dropped = 0
+		self.errors = 0
+		self.busy = 0.0			# seconds spent doing the stage's work
+		self.starved = 0.0		# seconds waiting for input
+		self.blocked = 0.0		# seconds waiting for room in the next queue
+		self.started = None
+		self.finished = None
+
+	def elapsed(self):
+		if self.started is None:
+			return 0.0
+		return (self.finished or time.monotonic()) - self.started
+
+	def utilization(self):
+		# fraction of the stage's running time spent working
+		elapsed = self.elapsed()
+		if elapsed <= 0:
+			return 0.0
+		return self.busy / elapsed
+
+	def __str__(self):
+		return "%-9s %-7s %6d items %4d dropped %4d errors  busy %5.1f%%  starved %6.3fs  blocked %6.3fs" % (self.name, self.worker, self.items, self.dropped, self.errors, self.utilization() * 100, self.starved, self.blocked)
+
+
+class HeliosPipeline():
+	def __init__(self, dac, source, pps, transform=None, optimize=None, encode=None, flags = HELIOS_FLAGS_DEFAULT, queuesize=4, workers=None, debug=0):
+		# workers maps a stage name to "thread" or "process", stages default to threads.
+		# functions run in a process must be picklable (module level). source and transmit
+		# always run on threads as they hold the iterator and the usb handle
+		self.debug = debug
+		self.running = False
+		self.threads = []
+		self.executors = []
+		workers = workers or {}
+		if encode is None:
+			encode = partial(encodeFrame, pps, flags)
+		funcs = {"source": source, "transform": transform, "optimize": optimize, "encode": encode, "transmit": dac.writeFrame}
+		self.stages = []
+		for name in PIPELINE_STAGES:
+			if funcs[name] is None:
+				continue
+			worker = workers.get(name, "thread")
+			if worker not in ("thread", "process"):
+				raise ValueError("unknown worker type %s for stage %s" % (worker, name))
+			if (name in ("source", "transmit")) and (worker != "thread"):
+				raise ValueError("the %s stage has to run on a thread" % name)
+			if worker == "process":
+				try:
+					pickle.dumps(funcs[name])
+				except Exception as e:
+					raise ValueError("the %s stage can't run in a process, its function can't be pickled (%s)" % (name, e))
+			self.stages.append((name, funcs[name], PipelineStageStats(name, worker)))
+		self.queues = [queue.Queue(maxsize=queuesize) for i in range(len(self.stages) - 1)]
+
+	def start(self):
+		self.running = True
+		for n,(name, func, stats) in enumerate(self.stages):
+			inq = self.queues[n - 1] if n > 0 else None
+			outq = self.queues[n] if n < len(self.queues) else None
+			if name == "source":
+				target = self._sourceLoop
+				args = (func, outq, stats)
+			else:
+				if stats.worker == "process":
+					executor = ProcessPoolExecutor(max_workers=1)
+					self.executors.append(executor)
+					func = partial(self._runRemote, executor, func)
+				target = self._stageLoop
+				args = (func, inq, outq, stats)
+			worker = Thread(target=target, args=args)
+			worker.daemon = True
+			worker.start()
+			self.threads.append(worker)
+		return self
+
+	def stop(self):
+		# the source stops at the next frame, frames already in the pipeline are still sent
+		self.running = False
+
+	def join(self, timeout=None):
+		for worker in self.threads:
+			worker.join(timeout)
+		for executor in self.executors:
+			executor.shutdown()
+		self.executors = []
+
+	def run(self):
+		# runs until the source is exhausted
+		self.start()
+		self.join()
+		return self.stats()
+
+	def stats(self):
+		return [stats for name, func, stats in self.stages]
+
+	def __str__(self):
+		return "\n".join([str(s) for s in self.stats()])
+
+	@staticmethod
+	def _runRemote(executor, func, item):
+		return executor.submit(func, item).result()
+
+	def _put(self, outq, item, stats):
+		t = time.monotonic()
+		outq.put(item)
+		stats.blocked += time.monotonic() - t
+
+	def _sourceLoop(self, source, outq, stats):
+		stats.started = time.monotonic()
+		it = iter(source)
+		while self.running:
+			t = time.monotonic()
+			try:
+				item = next(it)
+			except StopIteration:
+				break
+			except Exception as e:
+				stats.errors += 1
+				if self.debug:
+					print("source: %s" % e)
+				break
+			finally:
+				stats.busy += time.monotonic() - t
+			stats.items += 1
+			self._put(outq, item, stats)
+		self._put(outq, _STOP, stats)
+		stats.finished = time.monotonic()
+
+	def _stageLoop(self, func, inq, outq, stats):
+		stats.started = time.monotonic()
+		while True:
+			t = time.monotonic()
+			item = inq.get()
+			stats.starved += time.monotonic() - t
+			if item is _STOP:
+				break
+			t = time.monotonic()
+			try:
+				item = func(item)
+			except Exception as e:
+				stats.errors += 1
+				if self.debug:
+					print("%s: %s" % (stats.name, e))
+				continue
+			finally:
+				stats.busy += time.monotonic() - t
+			# None or a negative helios error code drops the frame
+			if (item is None) or (isinstance(item, int) and (item < 0)):
+				stats.dropped += 1
+				continue
+			stats.items += 1
+			if outq is not None:
+				self._put(outq, item, stats)
+		if outq is not None:
+			self._put(outq, _STOP, stats)
+		stats.finished = time.monotonic()
@@ -0,0 +1,42 @@
+import numpy as np
+
+# point types shared by the dac code and the offline tools (preview, tween), kept free of
+# usb and matplotlib so those tools can run headless
+
+# point layout used for array based frames (newFrameArray), a point with no color is blanked
+HELIOS_POINT_DTYPE = np.dtype([("x","<u2"),("y","<u2"),("r","u1"),("g","u1"),("b","u1"),("i","u1")])
+
+class HeliosPoint():
+	def __init__(self,x,y,c = 0xff0000,i= 255,blank=False):
+		self.x = x
+		self.y = y
+		self.c = c
+		self.i = i
+		self.blank = blank
+		
+	def __str__(self):
+		if isinstance(self.c, int):
+			c = self.c
+		else:
+			c = (self.c[0] << 16) | (self.c[1] << 8) | self.c[2]
+		return "HeleiosPoint(%d, %d,0x%06x,%d,%d)" % (self.x, self.y, c,self.i, self.blank)
+
+def pointsToArray(pntobjlist):
+	# converts a list of HeliosPoints to a HELIOS_POINT_DTYPE array, colors can be 0xRRGGBB
+	# or an (r,g,b) palette entry, coordinates are clamped to the dac range. arrays are
+	# returned as they are
+	if isinstance(pntobjlist, np.ndarray):
+		return pntobjlist
+	points = np.zeros(len(pntobjlist), dtype=HELIOS_POINT_DTYPE)
+	if len(pntobjlist) == 0:
+		return points
+	points["x"] = np.clip([p.x for p in pntobjlist], 0, 0xFFF)
+	points["y"] = np.clip([p.y for p in pntobjlist], 0, 0xFFF)
+	rgbi = np.array([(0,0,0,0) if p.blank else
+			(((p.c >> 16) & 0xff, (p.c >> 8) & 0xff, p.c & 0xff) if isinstance(p.c, int) else tuple(p.c)) + (p.i,)
+		for p in pntobjlist], dtype=np.uint8)
+	points["r"] = rgbi[:,0]
+	points["g"] = rgbi[:,1]
+	points["b"] = rgbi[:,2]
+	points["i"] = rgbi[:,3]
+	return points
@@ -0,0 +1,146 @@
+import math
+import struct
+import zlib
+import numpy as np
+from points import pointsToArray
+
+# offscreen previews of frames, no display or matplotlib needed.
+# frames can be HeliosPoint lists (as from loadILDfile/generateText) or HELIOS_POINT_DTYPE arrays
+
+
+def _frameEnergy(points, width, height, dwell):
+	# draws every lit segment of a frame into a float image. the dac goes from point to
+	# point in order and loops back to the first, a segment takes the color of the point
+	# it ends on so a blanked point makes the move into it dark. with dwell each segment
+	# spreads one point period over the pixels it covers, long moves come out dimmer
+	img = np.zeros((height * width, 3), dtype=np.float32)
+	points = pointsToArray(points)
+	if len(points) == 0:
+		return img.reshape((height, width, 3))
+	x1 = points["x"].astype(np.float32) * ((width - 1) / 4095.0)
+	y1 = (4095 - points["y"].astype(np.float32)) * ((height - 1) / 4095.0)
+	color = np.stack((points["r"], points["g"], points["b"]), axis=1).astype(np.float32) * (points["i"].astype(np.float32) / (255.0 * 255.0))[:,None]
+	lit = color.any(axis=1)
+	x0 = np.roll(x1, 1)[lit]
+	y0 = np.roll(y1, 1)[lit]
+	x1 = x1[lit]
+	y1 = y1[lit]
+	color = color[lit]
+	if len(x1) == 0:
+		return img.reshape((height, width, 3))
+
+	dx = x1 - x0
+	dy = y1 - y0
+	steps = np.ceil(np.maximum(np.abs(dx), np.abs(dy))).astype(np.int64) + 1
+	seg = np.repeat(np.arange(len(steps)), steps)
+	first = np.cumsum(steps) - steps
+	t = (np.arange(len(seg)) - first[seg]) / np.maximum(steps - 1, 1)[seg]
+	px = np.rint(x0[seg] + dx[seg] * t).astype(np.int64)
+	py = np.rint(y0[seg] + dy[seg] * t).astype(np.int64)
+	flat = py * width + px
+	if dwell:
+		weight = 1.0 / steps[seg]
+		for ch in range(3):
+			img[:,ch] = np.bincount(flat, weights=weight * color[seg,ch], minlength=width * height)
+	else:
+		img[flat] = color[seg]
+	return img.reshape((height, width, 3))
+
+def rasterizeFrames(frames, width=256, height=256, pps=None, persistence=None, gain=4.0):
+	# yields an (height, width, 3) uint8 image per frame.
+	# without pps every lit segment is drawn at full color. with pps the brightness follows
+	# how long the beam spends on each pixel, and persistence (seconds) additionally lets
+	# earlier frames fade out over time based on how long each frame takes at pps
+	if (persistence is not None) and (pps is None):
+		raise ValueError("persistence needs pps")
+	acc = None
+	for points in frames:
+		points = pointsToArray(points)
+		energy = _frameEnergy(points, width, height, pps is not None)
+		if pps is None:
+			yield (np.clip(energy, 0.0, 1.0) * 255).astype(np.uint8)
+			continue
+		if (persistence is None) or (acc is None):
+			acc = energy
+		else:
+			acc *= math.exp(-(max(len(points), 1) / pps) / persistence)
+			acc += energy
+		yield (np.clip(acc * gain, 0.0, 1.0) * 255).astype(np.uint8)
+
+def rasterizeFrame(points, width=256, height=256, pps=None, gain=4.0):
+	return next(rasterizeFrames([points], width, height, pps, gain=gain))
+
+def contactSheet(images, columns=8, border=2):
+	# tiles images into a single image, row by row
+	images = list(images)
+	if not images:
+		return np.zeros((0, 0, 3), dtype=np.uint8)
+	(h, w) = images[0].shape[:2]
+	rows = (len(images) + columns - 1) // columns
+	sheet = np.zeros((rows * (h + border) + border, columns * (w + border) + border, 3), dtype=np.uint8)
+	for n,img in enumerate(images):
+		y = border + (n // columns) * (h + border)
+		x = border + (n % columns) * (w + border)
+		sheet[y:y + h, x:x + w] = img
+	return sheet
+
+def _pngChunk(tag, data):
+	return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff)
+
+def encodePNG(image, level=1):
+	(h, w) = image.shape[:2]
+	raw = np.zeros((h, w * 3 + 1), dtype=np.uint8)	# filter byte 0 on every row
+	raw[:,1:] = np.ascontiguousarray(image, dtype=np.uint8).reshape((h, w * 3))
+	return (b"\x89PNG\r\n\x1a\n" +
+		_pngChunk(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 2, 0, 0, 0)) +
+		_pngChunk(b"IDAT", zlib.compress(raw.tobytes(), level)) +
+		_pngChunk(b"IEND", b""))
+
+def writePNG(filename, image, level=1):
+	with open(filename, "wb") as f:
+		f.write(encodePNG(image, level))
+
+def writePNGSequence(pattern, images, level=1):
+	# pattern is a % format taking the frame number, e.g. "frame%04d.png"
+	n = 0
+	for n,img in enumerate(images, 1):
+		writePNG(pattern % (n - 1), img, level)
+	return n
+
+# gifs use a fixed 3-3-2 bit palette so frames need no per frame quantizing
+GIF_PALETTE = np.array([((i >> 5) * 255 // 7, ((i >> 2) & 7) * 255 // 7, (i & 3) * 255 // 3) for i in range(256)], dtype=np.uint8)
+GIF_CLEAR_EVERY = 250
+
+def _gifImageData(image):
+	# lzw stream that only ever emits literals, a clear code every GIF_CLEAR_EVERY pixels
+	# keeps the code size at 9 bits, larger than real lzw output but needs no dictionary
+	img = image.astype(np.uint16)
+	pixels = ((img[...,0] >> 5) << 5) | ((img[...,1] >> 5) << 2) | (img[...,2] >> 6)
+	pixels = pixels.ravel()
+	codes = np.insert(pixels, np.arange(0, len(pixels), GIF_CLEAR_EVERY), 256)
+	codes = np.append(codes, 257)
+	bits = ((codes[:,None] >> np.arange(9, dtype=np.uint16)) & 1).astype(np.uint8)
+	data = np.packbits(bits.ravel(), bitorder="little").tobytes()
+	out = [b"\x08"]
+	for i in range(0, len(data), 255):
+		block = data[i:i + 255]
+		out.append(bytes((len(block),)) + block)
+	out.append(b"\x00")
+	return b"".join(out)
+
+def writeGIF(filename, images, fps=25, loop=0):
+	# animated gif, loop=0 repeats forever
+	delay = max(int(round(100.0 / fps)), 1)
+	with open(filename, "wb") as f:
+		n = 0
+		for img in images:
+			(h, w) = img.shape[:2]
+			if n == 0:
+				f.write(b"GIF89a" + struct.pack("<HHBBB", w, h, 0xF7, 0, 0) + GIF_PALETTE.tobytes())
+				f.write(b"\x21\xFF\x0BNETSCAPE2.0\x03\x01" + struct.pack("<H", loop) + b"\x00")
+			f.write(b"\x21\xF9\x04\x00" + struct.pack("<H", delay) + b"\x00\x00")
+			f.write(b"\x2C" + struct.pack("<HHHHB", 0, 0, w, h, 0))
+			f.write(_gifImageData(img))
+			n += 1
+		f.write(b"\x3B")
+	return n
@@ -0,0 +1,96 @@
+import numpy as np
+from points import HELIOS_POINT_DTYPE, pointsToArray
+
+# in-between frames for low frame rate animations, frames can be HeliosPoint lists
+# or HELIOS_POINT_DTYPE arrays, generated frames are HELIOS_POINT_DTYPE arrays
+
+
+def resampleFrame(points, n):
+	# returns the frame with n points. growing a frame keeps every original point and
+	# inserts the new ones along the segments, longer segments getting more of them.
+	# an inserted point takes the color of the point its segment ends on, so blanked
+	# moves stay blanked. shrinking picks evenly spaced points and can lose detail
+	points = pointsToArray(points)
+	m = len(points)
+	if (m == n) or (m == 0):
+		return points
+	if n < m:
+		return points[np.rint(np.linspace(0, m - 1, n)).astype(np.int64)]
+	if m == 1:
+		return np.repeat(points, n)
+
+	x = points["x"].astype(np.float64)
+	y = points["y"].astype(np.float64)
+	weight = np.hypot(np.diff(x), np.diff(y)) + 1e-6
+	share = weight * ((n - m) / weight.sum())
+	counts = np.floor(share).astype(np.int64)
+	short = (n - m) - counts.sum()
+	if short > 0:
+		counts[np.argsort(counts - share)[:short]] += 1
+	counts = np.append(counts, 0)
+
+	seg = np.repeat(np.arange(m), counts + 1)
+	nxt = np.minimum(seg + 1, m - 1)
+	j = np.arange(n) - np.repeat(np.cumsum(counts + 1) - (counts + 1), counts + 1)
+	frac = j / (counts[seg] + 1)
+	out = np.empty(n, dtype=HELIOS_POINT_DTYPE)
+	out["x"] = np.rint(x[seg] + (x[nxt] - x[seg]) * frac)
+	out["y"] = np.rint(y[seg] + (y[nxt] - y[seg]) * frac)
+	inserted = j > 0
+	for f in ("r", "g", "b", "i"):
+		out[f] = np.where(inserted, points[f][nxt], points[f][seg])
+	return out
+
+def _lit(points):
+	return ((points["r"] | points["g"] | points["b"]) > 0) & (points["i"] > 0)
+
+def interpolateFrames(a, b, t):
+	# point by point blend of two frames with the same point count, t from 0 (a) to 1 (b).
+	# positions always blend, colors only blend between two lit points. blanking is on or
+	# off, a point blanked in only one frame takes that frame's color up to the halfway
+	# point, so a blanked move never turns into a dim visible beam
+	out = np.empty(len(a), dtype=HELIOS_POINT_DTYPE)
+	for f in ("x", "y"):
+		fa = a[f].astype(np.float32)
+		out[f] = np.rint(fa + (b[f].astype(np.float32) - fa) * t)
+	both = _lit(a) & _lit(b)
+	nearest = b if t >= 0.5 else a
+	for f in ("r", "g", "b", "i"):
+		fa = a[f].astype(np.float32)
+		out[f] = np.where(both, np.rint(fa + (b[f].astype(np.float32) - fa) * t), nearest[f])
+	return out
+
+def tweenFrames(frames, steps=1, loop=False):
+	# yields every keyframe followed by steps in-between frames towards the next one.
+	# frames are only read, resampled and blended as the caller asks for them so this can
+	# sit directly in a playback loop. with loop the last frame also tweens back to the first
+	it = iter(frames)
+	try:
+		first = prev = pointsToArray(next(it))
+	except StopIteration:
+		return
+	while True:
+		try:
+			nxt = pointsToArray(next(it))
+		except StopIteration:
+			if not loop:
+				yield prev
+				return
+			nxt = first
+			loop = False
+			last = True
+		else:
+			last = False
+		yield prev
+		if (len(prev) > 0) and (len(nxt) > 0):
+			n = max(len(prev), len(nxt))
+			a = resampleFrame(prev, n)
+			b = resampleFrame(nxt, n)
+			for s in range(1, steps + 1):
+				yield interpolateFrames(a, b, s / (steps + 1.0))
+		else:
+			for s in range(steps):
+				yield prev
+		if last:
+			return
+		prev = nxt